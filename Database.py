@@ -1,12 +1,17 @@
 
 import sqlite3
+from datetime import datetime, timezone
 from tkinter import messagebox
 from tkinter import filedialog
-import pandas as pd
 class Database:
     def __init__(self, db_name='financial_manager2.db'):
         self.conn = sqlite3.connect(db_name)
         self.c = self.conn.cursor()
+        #memoized username/vault name lists, cleared whenever a user or vault is added
+        self._names_cache = {}
+        #category/unit name -> id, the app never renames or re-numbers them
+        self._category_cache = {}
+        self._unit_cache = {}
         self.create_tables()
     
     def create_tables(self):
@@ -83,25 +88,29 @@ class Database:
     #database accessing
 
     #users
-    def get_user_id(self,username):
+    def _try_get_user_id(self,username):
+        #returns None for unknown users instead of raising, for existence checks
         username = str(username)
         username = username.capitalize()
         self.c.execute("SELECT user_id FROM users WHERE username = ?",(username,))
-        user_id = self.c.fetchone()[0]
+        user = self.c.fetchone()
+        return user[0] if user else None
+    def get_user_id(self,username):
+        user_id = self._try_get_user_id(username)
+        if user_id is None:
+            raise ValueError(f"user '{username}' doesn't exist")
         return user_id
     def get_usernames(self):
+        if "usernames" in self._names_cache:
+            return self._names_cache["usernames"]
         self.c.execute("SELECT username FROM users")
         res = self.c.fetchall()
         usernames = [username[0] for username in res]
+        self._names_cache["usernames"] = usernames
         return usernames
     def user_exists(self,username):
         #check if user exists
-        username = str(username)
-        username = username.capitalize()
-        self.c.execute("SELECT * FROM users WHERE username = ? ", 
-                       (username,))
-        user = self.c.fetchone()
-        return user
+        return self._try_get_user_id(username) is not None
     def check_user_password(self,username,password):
         username = str(username)
         username = username.capitalize()
@@ -121,6 +130,7 @@ class Database:
         self.c.execute("INSERT INTO vaults (user_id,vault_name,balance) VALUES (?,?,0)",
                        (user_id,"Main"))
         self.conn.commit()
+        self._names_cache.clear()
         return True
     
     #vaults
@@ -130,17 +140,15 @@ class Database:
         vault_id = self.c.fetchone()[0]
         return vault_id
     def vault_exists(self,username,vault_name):
-        #check if vault exists
-        username = str(username)
-        username = username.capitalize()
-        user_id = self.get_user_id(username)
+        #check if vault exists, an unknown user has no vaults
+        user_id = self._try_get_user_id(username)
+        if user_id is None:
+            return None
         self.c.execute("SELECT * FROM vaults WHERE user_id = ? AND vault_name = ?",
                         (user_id, vault_name))
         vault = self.c.fetchone()
         return vault
     def add_vault(self,username,vault_name):
-        username = str(username)
-        username = username.capitalize()
         user_id = self.get_user_id(username)
         #adds vault if it doesnt exist already
         vault_name = vault_name.capitalize() #Make sure all vault names start with capital letter
@@ -149,6 +157,7 @@ class Database:
         self.c.execute("INSERT INTO vaults (user_id,vault_name,balance) VALUES (?,?,0)",
                        (user_id,vault_name))
         self.conn.commit()
+        self._names_cache.clear()
         return True
     def remove_vault(self,username,vault_name):
         #removes a vault
@@ -156,8 +165,6 @@ class Database:
         # also the Main vault can't be deleted and all vault names start with a capital letter
         pass
     def vault_has_balance(self,username,vault_name,amount):
-        username = str(username)
-        username = username.capitalize()
         user_id = self.get_user_id(username)
         self.c.execute("SELECT balance FROM vaults WHERE user_id = ? AND vault_name = ?",(user_id,vault_name))
         balance = self.c.fetchone()[0]
@@ -168,15 +175,11 @@ class Database:
             messagebox.showerror("incorrect amount", "money amount must be an integer")
         return balance>=amount
     def add_to_vault(self,username,vault_name,amount):
-        username = str(username)
-        username = username.capitalize()
         user_id = self.get_user_id(username)
         self.c.execute("UPDATE vaults SET balance = balance + ? WHERE user_id = ? AND vault_name = ?",
                     (amount, user_id,vault_name)) 
         return True
     def remove_from_vault(self,username,vault_name,amount):
-        username = str(username)
-        username = username.capitalize()
         if not self.vault_has_balance(username,vault_name,amount):
             raise ValueError("insufficent funds")
         user_id = self.get_user_id(username)
@@ -184,43 +187,49 @@ class Database:
                     (amount, user_id,vault_name)) 
         return True
     def get_user_vault_names(self,username):
-        username = str(username)
-        username = username.capitalize()
+        key = ("vault_names",str(username).capitalize())
+        if key in self._names_cache:
+            return self._names_cache[key]
         user_id = self.get_user_id(username)
         self.c.execute("SELECT vault_name FROM vaults WHERE user_id = ?",(user_id,))
         vaults = self.c.fetchall()
         vault_names = [vault[0] for vault in vaults]
+        self._names_cache[key] = vault_names
         return vault_names
+    def get_vault_names_by_user(self):
+        #one query for every user's vault names instead of one query per user
+        if "vault_names_by_user" in self._names_cache:
+            return self._names_cache["vault_names_by_user"]
+        self.c.execute('''SELECT users.username, vaults.vault_name
+                          FROM vaults JOIN users ON vaults.user_id = users.user_id
+                          ORDER BY vaults.vault_name''')
+        vault_names_by_user = {}
+        for username,vault_name in self.c.fetchall():
+            vault_names_by_user.setdefault(username,[]).append(vault_name)
+        self._names_cache["vault_names_by_user"] = vault_names_by_user
+        return vault_names_by_user
     def get_user_vaults(self,username):
-        username = str(username)
-        username = username.capitalize()
         user_id = self.get_user_id(username)
         self.c.execute("SELECT vault_name,balance FROM vaults WHERE user_id = ?",(user_id,))
-        vaults = self.c.fetchall()
-        vault_dict={}
-        for vault_name,balance in vaults:
-            vault_dict[vault_name]=balance
+        vault_dict = dict(self.c.fetchall())
         return vault_dict
     def get_user_balance(self,username):
-        username = username.capitalize()
         user_id = self.get_user_id(username)
-        self.c.execute("SELECT balance FROM vaults WHERE user_id = ?",(user_id,))
-        balances = self.c.fetchall()
-        total_balance = 0
-        for balance in balances:
-            total_balance+=balance[0]
+        #let sqlite add the balances up instead of looping over every vault row
+        self.c.execute("SELECT COALESCE(SUM(balance),0) FROM vaults WHERE user_id = ?",(user_id,))
+        total_balance = self.c.fetchone()[0]
         return total_balance
     #transactions
-    def add_transaction(self,username,vault_name,transaction_type,money_amount,category,description,quantity=None,unit=None):
+    def add_transaction(self,username,vault_name,transaction_type,money_amount,category,description,quantity=None,unit=None,date=None):
+        #date defaults to sqlite's datetime('now'), pass one in to stamp several rows with the same time
         vault_id = self.get_vault_id(username,vault_name)
         category_id = self.get_category_id(category)
         unit_id = self.get_unit_id(unit)
         self.c.execute('''INSERT INTO transactions 
                        (vault_id, transaction_type,amount,category_id, description, quantity,unit_id,date)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
+                        VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, datetime('now')))
                   ''', 
-                (vault_id,transaction_type,money_amount,category_id,description.lower(),quantity,unit_id))
-        self.conn.commit()
+                (vault_id,transaction_type,money_amount,category_id,description.lower(),quantity,unit_id,date))
         return True
     #loans
     
@@ -228,20 +237,11 @@ class Database:
     def add_loan(self,from_user,from_vault,to_user,to_vault,money_amount):
         from_vault_id = self.get_vault_id(from_user,from_vault)
         to_vault_id = self.get_vault_id(to_user,to_vault)
-        def loan_exists():
-            self.c.execute("SELECT * FROM loans WHERE from_vault_id= ? AND to_vault_id= ?",
-                           (from_vault_id,to_vault_id))
-            loan = self.c.fetchall()
-            return len(loan)>=1
-        if(loan_exists()):
-            self.c.execute("""UPDATE loans 
-                            SET amount = amount + ?
-                            WHERE from_vault_id = ? AND to_vault_id = ?""",
-                            (money_amount,from_vault_id,to_vault_id))
-        else:
-            self.c.execute("INSERT INTO loans (from_vault_id,to_vault_id,amount) VALUES(?,?,?)",
-                           (from_vault_id,to_vault_id,money_amount))
-        self.conn.commit()
+        #adds to the existing loan between these vaults, or starts a new one
+        self.c.execute("""INSERT INTO loans (from_vault_id,to_vault_id,amount) VALUES(?,?,?)
+                        ON CONFLICT (from_vault_id,to_vault_id)
+                        DO UPDATE SET amount = amount + excluded.amount""",
+                        (from_vault_id,to_vault_id,money_amount))
         
     def get_loans(self, username):
         query = '''
@@ -262,8 +262,11 @@ class Database:
         return results
     #categories
     def get_category_id(self,category):
+        if category in self._category_cache:
+            return self._category_cache[category]
         self.c.execute("SELECT category_id FROM categories WHERE category_name = ?",(category,))
         category_id = self.c.fetchone()[0]
+        self._category_cache[category] = category_id
         return category_id
     
     def get_category_names(self):
@@ -275,8 +278,11 @@ class Database:
     def get_unit_id(self,unit_name):
         if not unit_name:
             return None
+        if unit_name in self._unit_cache:
+            return self._unit_cache[unit_name]
         self.c.execute("SELECT unit_id FROM units WHERE unit_name = ?",(unit_name,))
         unit_id = self.c.fetchone()[0]
+        self._unit_cache[unit_name] = unit_id
         return unit_id
     def get_unit_names(self):
         self.c.execute("SELECT unit_name FROM units")
@@ -284,27 +290,39 @@ class Database:
         unit_names = [unit[0] for unit in  units]
         return unit_names
     #services
+    #every service runs in one sqlite transaction ("with self.conn"):
+    #it is committed once at the end, or rolled back as a whole if any step fails
     def deposit(self,username,vault_name,amount,category_name,description,quantity=None,unit=None):
-        self.add_to_vault(username,vault_name,amount)
-        self.add_transaction(username,vault_name,"Deposit",float(amount),category_name,description,quantity,unit)
+        with self.conn:
+            self.add_to_vault(username,vault_name,amount)
+            self.add_transaction(username,vault_name,"Deposit",float(amount),category_name,description,quantity,unit)
         return True
     
     def withdraw(self,username,vault_name,amount,category_name,description,quantity=None,unit=None):
-        self.remove_from_vault(username,vault_name,amount)
-        self.add_transaction(username,vault_name,"Withdraw",-float(amount),category_name,description,quantity,unit)
+        with self.conn:
+            self.remove_from_vault(username,vault_name,amount)
+            self.add_transaction(username,vault_name,"Withdraw",-float(amount),category_name,description,quantity,unit)
         return True
     def transfer(self,from_user,from_vault,to_user,to_vault,amount,description=None,is_loan_=False):
+        with self.conn:
+            self._transfer(from_user,from_vault,to_user,to_vault,amount,description,is_loan_)
+    def _transfer(self,from_user,from_vault,to_user,to_vault,amount,description=None,is_loan_=False):
+        #doesn't commit, so loan() can add its loan record in the same transaction
         transaction_type= "Loan" if is_loan_ else "Transfer"
         description = description if description else f"{transaction_type}ing money" 
+        #both sides of the transfer share one timestamp (same UTC format as datetime('now'))
+        date = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
         self.remove_from_vault(from_user,from_vault,amount)
         self.add_to_vault(to_user,to_vault,amount)
-        self.add_transaction(from_user,from_vault,transaction_type,-float(amount),"Others",description)
-        self.add_transaction(to_user,to_vault,transaction_type,amount,"Others",description)
+        self.add_transaction(from_user,from_vault,transaction_type,-float(amount),"Others",description,date=date)
+        self.add_transaction(to_user,to_vault,transaction_type,amount,"Others",description,date=date)
 
     def loan(self,from_user,from_vault,to_user,to_vault,amount,description=None):
-        self.transfer(from_user,from_vault,to_user,to_vault,amount,description,is_loan_=True)
-        self.add_loan(from_user,from_vault,to_user,to_vault,amount)
+        with self.conn:
+            self._transfer(from_user,from_vault,to_user,to_vault,amount,description,is_loan_=True)
+            self.add_loan(from_user,from_vault,to_user,to_vault,amount)
     def export_to_excel(self,username):
+        import pandas as pd #only needed for exporting, so it isn't loaded at startup
         def get_transactions_as_df():
             self.c.execute('''
                 SELECT  vaults.vault_name,
@@ -1,13 +1,13 @@
-import tkinter as tk
-import customtkinter
-from tkinter import * # type: ignore
-from tkinter import messagebox
+from tkinter import Tk, Button, Entry, Label, OptionMenu, StringVar, messagebox
 from Database import Database as DB
 # GUI Interface
 class GUI:
     def __init__(self, master):
 
         self.db = DB("personal_financial_manager.db")
+        # transaction type -> database service, looked up once instead of an if/elif chain
+        self.transaction_services = {"Withdraw": self.db.withdraw,
+                                     "Deposit": self.db.deposit}
 
         self.master = master
         self.master.title("Finance Manager")
@@ -125,6 +125,8 @@ class GUI:
         self.transaction_menu("Withdraw")
 
     def transaction_menu(self, transaction_type):
+        if transaction_type not in self.transaction_services:
+            raise ValueError(f"transaction type must be one of {list(self.transaction_services)}")
         self.destory_all_widgets()
 
         self.master.title(f"{transaction_type} Menu")
@@ -173,13 +175,11 @@ class GUI:
                                                                                 self.amount_entry.get(),chosen_category.get(),
                                                                                 self.description_entry.get(),self.quantity_entry.get(),
                                                                                 chosen_unit.get()))
-        elif transaction_type=="Deposit":
+        else:
             self.submit_button = Button(self.master, text=transaction_type, 
                                         command=lambda: self.process_transaction(transaction_type,chosen_vault.get(),
                                                                                 self.amount_entry.get(),chosen_category.get(),
                                                                                 self.description_entry.get()))
-        else:
-            raise ValueError("transaction type must be 'Withdraw' or 'Deposit' ")
         self.submit_button.pack(pady=10)
 
         self.back_button = Button(self.master, text="Back", command=lambda: self.user_menu())
@@ -188,14 +188,10 @@ class GUI:
     def process_transaction(self, transaction_type,vault,money_amount,category_name,description,quantity=None,unit=None):
        
         try:
-            if(transaction_type=="Withdraw"):
-                self.db.withdraw(self.username,vault,money_amount,category_name,description,quantity,unit)
-                print("Withdrew")
-            elif(transaction_type=="Deposit"):
-                self.db.deposit(self.username,vault,money_amount,category_name,description,quantity,unit)
-                print("Depsited")
-            else:
-                raise ValueError("transaction type must be 'Withdraw' or 'Deposit' ")
+            service = self.transaction_services.get(transaction_type)
+            if service is None:
+                raise ValueError(f"transaction type must be one of {list(self.transaction_services)}")
+            service(self.username,vault,money_amount,category_name,description,quantity,unit)
         except:
             messagebox.showerror("Unsuccessful Transaction",f"{transaction_type} transaction was unsuccessful")
         else:
@@ -207,7 +203,8 @@ class GUI:
 
         self.master.title("Transfer Menu")
 
-        from_vault_names = self.db.get_user_vault_names(self.username)
+        vault_names_by_user = self.db.get_vault_names_by_user()
+        from_vault_names = vault_names_by_user[self.username]
 
         self.from_vault_label = Label(self.master, text="From:")
         self.from_vault_label.grid(row=0,column=0, padx=5)
@@ -223,7 +220,7 @@ class GUI:
         self.to_user_options = OptionMenu(self.master,to_user,*self.db.get_usernames(), command=lambda username:refresh_to_user_vault_names(username))
         self.to_user_options.grid(row=1,column=1)
 
-        to_vault_names = self.db.get_user_vault_names(to_user.get())
+        to_vault_names = from_vault_names # to_user starts as the logged in user
         self.to_vault_label = Label(self.master, text="To vault:")
         self.to_vault_label.grid(row=2,column=0, padx=5)
         to_vault = StringVar(self.master)
@@ -250,17 +247,11 @@ class GUI:
         self.back_button.grid(row=6,column=1, pady=2)
 
         def refresh_to_user_vault_names(username):
-            to_vault_names = self.db.get_user_vault_names(username)
+            to_vault_names = vault_names_by_user[username]
             to_vault.set(to_vault_names[0])
             self.from_vault_options['menu'].delete(0,'end')
             for vault in to_vault_names:
                 self.from_vault_options['menu'].add_command(label=vault,command=lambda v=vault: to_vault.set(v))
-        def refresh_from_user_vault_names(username):
-            from_vault_names = self.db.get_user_vault_names(username)
-            from_vault.set(from_vault_names[0])
-            self.from_vault_options['menu'].delete(0,'end')
-            for vault in from_vault_names:
-                self.from_vault_options['menu'].add_command(label=vault,command=lambda:tk._setit(to_vault,vault))
 
 
     def process_transfer(self,from_vault,to_user,to_vault,amount,reason):
@@ -283,17 +274,18 @@ class GUI:
 
         self.master.title("Loan Menu")
 
-        vault_names = self.db.get_user_vault_names(self.username)
+        vault_names_by_user = self.db.get_vault_names_by_user()
+        vault_names = vault_names_by_user[self.username]
         usernames = self.db.get_usernames()
 
         self.from_user_label = Label(self.master, text="From user:")
         self.from_user_label.grid(row=0,column=0, padx=5)
         from_user = StringVar(self.master)
         from_user.set(self.username)
-        self.from_user_options = OptionMenu(self.master,from_user,*self.db.get_usernames(), command=lambda username:refresh_from_user_vault_names(username))
+        self.from_user_options = OptionMenu(self.master,from_user,*usernames, command=lambda username:refresh_from_user_vault_names(username))
         self.from_user_options.grid(row=0,column=1)
 
-        from_vault_names = self.db.get_user_vault_names(from_user.get())
+        from_vault_names = vault_names # from_user starts as the logged in user
         self.from_vault_label = Label(self.master, text="From vault:")
         self.from_vault_label.grid(row=1,column=0, padx=5)
         from_vault = StringVar(self.master)
@@ -337,13 +329,13 @@ class GUI:
         self.back_button.grid(row=8,column=1, pady=2)
 
         def refresh_to_user_vault_names(username):
-            to_vault_names = self.db.get_user_vault_names(username)
+            to_vault_names = vault_names_by_user[username]
             to_vault.set(to_vault_names[0])
             self.to_vault_options['menu'].delete(0,'end')
             for vault in to_vault_names:
                 self.to_vault_options['menu'].add_command(label=vault,command=lambda v=vault: to_vault.set(v))
         def refresh_from_user_vault_names(username):
-            from_vault_names = self.db.get_user_vault_names(username)
+            from_vault_names = vault_names_by_user[username]
             from_vault.set(from_vault_names[0])
             self.from_vault_options['menu'].delete(0,'end')
             for vault in from_vault_names:
@@ -396,17 +388,17 @@ class GUI:
         
 
     def summary_menu(self):
-        for widget in self.master.winfo_children():
-            widget.destroy()
+        self.destory_all_widgets()
 
         self.master.title("Summary Menu")
-        self.total_label = Label(self.master, text=f"Total Amount: {self.db.get_user_balance(self.username):.2f} EGP")
+        # the vault balances are fetched once and the total is summed from them
+        vaults = self.db.get_user_vaults(self.username)
+        self.total_label = Label(self.master, text=f"Total Amount: {sum(vaults.values()):.2f} EGP")
         self.total_label.pack(pady=10)
 
         # Display vault details
         self.vault_details_label = Label(self.master, text="Vault Details:")
         self.vault_details_label.pack(pady=2)
-        vaults = self.db.get_user_vaults(self.username)
         for vault_name,balance in vaults.items():
             vault_info = f"{vault_name}: {balance:.2f} EGP"
             Label(self.master, text=vault_info).pack(pady=2)
@@ -428,8 +420,7 @@ class GUI:
         self.back_button = Button(self.master, text="Back", command=lambda: self.user_menu())
         self.back_button.pack(pady=10)
     def account_menu(self):
-        for widget in self.master.winfo_children():
-            widget.destroy()
+        self.destory_all_widgets()
         self.username_label = Label(self.master,text=f"Username: {self.username}")
         self.username_label.pack(pady=2)
 
@@ -439,7 +430,7 @@ class GUI:
         self.change_password_button = Button(self.master,text="Change password")
         self.change_password_button.pack(pady=2)
 
-        self.export_button = tk.Button(self.master, text="Export data to Excel", command=self.export_to_excel)
+        self.export_button = Button(self.master, text="Export data to Excel", command=self.export_to_excel)
         self.export_button.pack(pady=10)
         
         self.logout_button = Button(self.master, text="Logout", command=self.main_menu)
@@ -448,6 +439,7 @@ class GUI:
         self.back_button = Button(self.master, text="Back", command=self.user_menu)
         self.back_button.pack(pady=2)
     def add_vault(self):
+        import customtkinter #only the vault name dialog uses it, so it is loaded on first use
         ask_new_name = customtkinter.CTkInputDialog(text="New vault name is:", title="Add new vault")
         new_vault_name = ask_new_name.get_input()
         new_vault_name=new_vault_name.capitalize()